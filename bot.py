@@ -1,14 +1,22 @@
 import os
+import asyncio
 import logging
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
 import discord
 from discord.ext import commands, tasks
 import yfinance as yf
-import ta
 from dotenv import load_dotenv
 import pandas as pd
 import numpy as np
-from datetime import datetime
+from datetime import datetime, time as dt_time
 import pytz
+from curl_cffi import requests as curl_requests
+
+from _indicators import compute_indicators
+from keep_alive import keep_alive
 
 # Load environment variables from a .env file
 load_dotenv()
@@ -42,147 +50,283 @@ bot = commands.Bot(command_prefix="!", intents=intents)
 
 logging.basicConfig(level=logging.INFO)
 
+# Cache of downloaded bars per (symbol, timeframe) so each tick only fetches new bars
+_BAR_CACHE: dict[tuple[str, str], pd.DataFrame] = {}
+# Enough history for SMA200 plus a buffer for the EMA/RSI warm-up
+_MAX_CACHED_BARS = 300
+# Initial download period per interval, sized to return ~250 bars (SMA200 + margin)
+# even for a 6h15m NSE session, weekends included. Yahoo only serves 2m-90m bars
+# from the last 60 days, so 90m is capped at '60d' (only ~5 NSE bars a day, about
+# 200 bars in total); 1m is limited to the last 7 days.
+_HISTORY_PERIODS = {
+    "1m": "5d",
+    "2m": "5d",
+    "5m": "7d",
+    "15m": "20d",
+    "30m": "45d",
+    "60m": "60d",
+    "90m": "60d",
+    "1h": "60d",
+    "1d": "1y",
+    "5d": "5y",
+    "1wk": "5y",
+    "1mo": "max",
+    "3mo": "max",
+}
+# (timestamp, close) of the latest bar the alert loop analyzed per (symbol, timeframe)
+_LAST_BAR: dict[tuple[str, str], tuple[pd.Timestamp, float]] = {}
+
+# Fibonacci retracement ratios and their display names
+_FIB_RATIOS = np.array([0.236, 0.382, 0.5, 0.618, 0.786])
+_FIB_NAMES = ('23.6%', '38.2%', '50%', '61.8%', '78.6%')
+
+# Trade setups by signal id (0 = none, 1 = buy, 2 = sell) as returned by classify_setup
+_SIGNALS = ("🤝 HOLD / WAIT (no confluence yet)", "✅ PRO-BUY Setup", "❌ PRO-SELL Setup")
+_STOP_LOSS_MULT = np.array([np.nan, 0.98, 1.02])   # 2% below / above
+_TAKE_PROFIT_MULT = np.array([np.nan, 1.04, 0.96]) # 4% above / below
+_SIGNAL_CONFLUENCE = (
+    (),
+    ("RSI oversold", "Price at Lower BB", "EMA9 > EMA21"),
+    ("RSI overbought", "Price at Upper BB", "EMA9 < EMA21"),
+)
+# Moving average crosses by cross id (0 = none, 1 = golden, 2 = death)
+_CROSSES = (None, "Golden Cross (Bullish)", "Death Cross (Bearish)")
+
 # ---------------- MARKET HOURS CHECK ----------------
+# Indian market hours (9:15 AM to 3:30 PM IST)
+_IST = pytz.timezone('Asia/Kolkata')
+_MKT_OPEN = dt_time(9, 15)
+_MKT_CLOSE = dt_time(15, 30)
+
 def is_market_open(symbol: str):
     """
     Checks if the market is open for a given symbol.
     Returns True for non-Indian stocks/crypto, and checks for Indian stocks.
+    The answer is reused for the rest of the current minute.
     """
+    return _is_market_open_at(symbol, int(time.time() // 60))
+
+@lru_cache(maxsize=256)
+def _is_market_open_at(symbol: str, minute_bucket: int):
+    """Market-hours check for the start of the given minute since the epoch."""
     if symbol.endswith(".NS"):
-        ist = pytz.timezone('Asia/Kolkata')
-        now = datetime.now(ist)
+        now = datetime.fromtimestamp(minute_bucket * 60, _IST)
         # Check if it's a weekday (Monday=0 to Friday=4)
         if now.weekday() >= 5: # Saturday or Sunday
             return False
-        # Check if the time is within market hours (9:15 AM to 3:30 PM IST)
-        # Note: 3:30 PM is 15:30
-        if now.time() >= datetime.strptime('09:15', '%H:%M').time() and now.time() <= datetime.strptime('15:30', '%H:%M').time():
-            return True
-        return False
+        # Check if the time is within market hours
+        return _MKT_OPEN <= now.time() <= _MKT_CLOSE
     # Assume other markets are always "open" for the purpose of this bot
     # or handle them with specific logic if needed
     return True
 
+# ---------------- DATA ----------------
+# One keep-alive session for every yfinance request. yfinance needs a curl_cffi session
+# and keeps it in a process-wide singleton anyway, so all worker threads share it.
+_YF_SESSION = curl_requests.Session(impersonate="chrome")
+# yf.download collects its results in a module-global dict that every call replaces,
+# so two downloads running at once in different threads mix up their tickers
+_YF_DOWNLOAD_LOCK = threading.Lock()
+
+def fetch_bars(symbol: str, timeframe: str):
+    """
+    Returns OHLC bars for a symbol, reusing previously downloaded bars.
+    The first call downloads enough history for the indicators; later calls
+    only download bars since the last cached one (which may have been partial).
+    """
+    df_prev = _BAR_CACHE.get((symbol, timeframe))
+    # Reuse a keep-alive session instead of the fresh one yf.download opens per call
+    ticker = yf.Ticker(symbol, session=_YF_SESSION)
+    if df_prev is None or df_prev.empty:
+        # Fall back to '60d', which every intraday interval like '5m' and '1h' supports
+        period = _HISTORY_PERIODS.get(timeframe, "60d")
+        df_new = ticker.history(period=period, interval=timeframe, auto_adjust=True)
+    else:
+        df_new = ticker.history(start=df_prev.index[-1], interval=timeframe, auto_adjust=True)
+    return _merge_bars(symbol, timeframe, df_new)
+
+def fetch_bars_batch(symbols: list[str], timeframe: str):
+    """
+    Same as fetch_bars for several symbols sharing a timeframe, using one
+    multi-ticker download for the uncached symbols and one for the rest.
+    Returns a dictionary of symbol -> bars. Symbols missing from the batch are
+    left out so the caller can fall back to fetch_bars for them.
+    """
+    cold = [s for s in symbols if (s, timeframe) not in _BAR_CACHE]
+    warm = [s for s in symbols if (s, timeframe) in _BAR_CACHE]
+    options = dict(interval=timeframe, auto_adjust=True, group_by="ticker", ignore_tz=False,
+                   threads=False, progress=False, session=_YF_SESSION)
+
+    downloads = []
+    with _YF_DOWNLOAD_LOCK:
+        if cold:
+            period = _HISTORY_PERIODS.get(timeframe, "60d")
+            downloads.append((cold, yf.download(cold, period=period, **options)))
+        if warm:
+            # Start from the oldest last bar so every symbol gets all of its new bars
+            start = min(_BAR_CACHE[(s, timeframe)].index[-1] for s in warm)
+            downloads.append((warm, yf.download(warm, start=start, **options)))
+
+    bars = {}
+    for group, big in downloads:
+        tickers = big.columns.get_level_values(0) if not big.empty else ()
+        for symbol in group:
+            # Symbols trading different hours leave all-NaN rows in the combined frame
+            df_new = big.xs(symbol, axis=1, level=0).dropna(how="all") if symbol in tickers else None
+            if df_new is None or df_new.empty:
+                # yfinance only logs per-ticker failures, don't pass the stale cache off as fresh
+                logging.warning(f"No {timeframe} bars for {symbol} in the batch download")
+                continue
+            bars[symbol] = _merge_bars(symbol, timeframe, df_new)
+    return bars
+
+def _merge_bars(symbol: str, timeframe: str, df_new):
+    """Merges freshly downloaded bars into the cache and returns a copy of the result."""
+    key = (symbol, timeframe)
+    df_prev = _BAR_CACHE.get(key)
+    if df_prev is None or df_prev.empty:
+        df = df_new
+    elif df_new.empty:
+        df = df_prev
+    else:
+        # Batched and per-ticker downloads may label the same bars in different time zones
+        if df_new.index.tz != df_prev.index.tz:
+            df_new = df_new.tz_convert(df_prev.index.tz)
+        # Drop the last cached bar, it is re-downloaded in its final form
+        df = pd.concat([df_prev.iloc[:-1], df_new])
+        df = df[~df.index.duplicated(keep="last")]
+
+    # Keep only bars with a close price so the indicator arrays line up with the frame
+    if not df.empty:
+        has_close = df["Close"].notna()
+        if not has_close.all():
+            df = df[has_close]
+    df = df.iloc[-_MAX_CACHED_BARS:]
+    if not df.empty:
+        _BAR_CACHE[key] = df
+    # Hand out a copy so callers can't modify the cached frame
+    return df.copy()
+
 # ---------------- ADVANCED ANALYSIS FUNCTIONS ----------------
 def get_fib_levels(df):
     """
     Calculates Fibonacci retracement levels for the last major swing.
-    Returns a dictionary of levels or None.
+    Returns an array of levels ordered like _FIB_NAMES, or None.
     """
     if df.empty:
         return None
     
-    # Find recent swing high and low
-    # Check for empty series before calling max/min
-    if df["High"].iloc[-25:].empty or df["Low"].iloc[-25:].empty:
+    # Find recent swing high and low on the raw arrays
+    highs = df["High"].to_numpy()[-25:]
+    lows = df["Low"].to_numpy()[-25:]
+    if highs.size == 0 or lows.size == 0:
         return None
         
-    swing_high = df["High"].iloc[-25:].max().item()
-    swing_low = df["Low"].iloc[-25:].min().item()
+    swing_high = np.nanmax(highs)
+    swing_low = np.nanmin(lows)
     
-    # Explicitly check for equality of scalar values
     if swing_high == swing_low:
         return None
     
-    diff = swing_high - swing_low
-    
-    fib_levels = {
-        '23.6%': swing_high - (diff * 0.236),
-        '38.2%': swing_high - (diff * 0.382),
-        '50%': swing_high - (diff * 0.5),
-        '61.8%': swing_high - (diff * 0.618),
-        '78.6%': swing_high - (diff * 0.786),
-    }
-    return fib_levels
+    return swing_high - (swing_high - swing_low) * _FIB_RATIOS
+
+def classify_setup(feats):
+    """
+    Evaluates the pro-trade rules on a feature vector, or on a batch of
+    them stacked along the first axis. Features are laid out as
+    (ema9, ema21, rsi, price, bb_low, bb_high, sma50, sma200, sma50_prev, sma200_prev).
+    Returns (signal_id, cross_id), see _SIGNALS and _CROSSES.
+    """
+    (ema9, ema21, rsi, price, bb_low, bb_high,
+     sma50, sma200, sma50_prev, sma200_prev) = np.moveaxis(feats, -1, 0)
+    # Pro-Buy: Strong Uptrend (EMA9 > EMA21), Oversold RSI, and price near Lower Bollinger Band
+    buy = (ema9 > ema21) & (rsi < 35) & (price <= bb_low)
+    # Pro-Sell: Strong Downtrend (EMA9 < EMA21), Overbought RSI, and price near Upper Bollinger Band
+    sell = (ema9 < ema21) & (rsi > 65) & (price >= bb_high)
+    golden = (sma50 > sma200) & (sma50_prev < sma200_prev)
+    death = (sma50 < sma200) & (sma50_prev > sma200_prev)
+    return np.select([buy, sell], [1, 2], 0), np.select([golden, death], [1, 2], 0)
 
 # ---------------- ANALYSIS ----------------
-def analyze_stock(symbol: str, timeframe: str = "1d"):
+def analyze_stock(symbol: str, timeframe: str = "1d", skip_unchanged: bool = False, bars=None):
     """
     Analyzes a stock or crypto using a more selective "pro-trade" strategy.
     
     Args:
         symbol (str): The stock or crypto ticker symbol.
         timeframe (str): The interval for the data (e.g., "1d", "1h", "5m").
+        skip_unchanged (bool): Skip the analysis if the latest bar (timestamp
+            and close) is the same as in the last call that set this flag and
+            finished its analysis.
+        bars (DataFrame): Bars already fetched for this symbol, e.g. by
+            fetch_bars_batch. Downloaded with fetch_bars when omitted.
     
     Returns:
         tuple: (price, formatted_message) or (None, error_message).
+        (None, None) when skipped because the data hasn't changed.
     """
     try:
         # Use the specified timeframe for data download
-        # Updated period to '60d' to support intraday intervals like '5m' and '1h'
-        df = yf.download(symbol, period="60d", interval=timeframe, auto_adjust=True)
+        df = fetch_bars(symbol, timeframe) if bars is None else bars
     except Exception as e:
         return None, f"❌ Error fetching data for {timeframe} timeframe: {e}"
 
     if df.empty:
         return None, "⚠️ No data available (market closed?)"
-    
-    # Ensure close prices are a 1-dimensional array
-    close_prices = df["Close"].dropna().to_numpy().flatten()
-    
-    if close_prices.size == 0:
-        return None, f"❌ Error: 'Close' price data for {symbol} is empty after cleaning."
 
-    # Indicators
-    df["EMA9"] = ta.trend.EMAIndicator(pd.Series(close_prices), window=9).ema_indicator()
-    df["EMA21"] = ta.trend.EMAIndicator(pd.Series(close_prices), window=21).ema_indicator()
-    df["RSI"] = ta.momentum.RSIIndicator(pd.Series(close_prices)).rsi()
-    bb = ta.volatility.BollingerBands(pd.Series(close_prices))
-    df["BB_high"] = bb.bollinger_hband()
-    df["BB_low"] = bb.bollinger_lband()
+    if skip_unchanged:
+        # The latest bar is usually still forming, so its close is part of the key:
+        # a signal that only appears later in the bar is still picked up
+        last_bar = (df.index[-1], df["Close"].to_numpy(copy=False)[-1].item())
+        if _LAST_BAR.get((symbol, timeframe)) == last_bar:
+            return None, None
     
-    df['SMA50'] = df['Close'].rolling(window=50).mean()
-    df['SMA200'] = df['Close'].rolling(window=200).mean()
+    # Indicators
+    # float32 keeps ~7 significant digits, plenty for the indicator thresholds.
+    # The kernel needs a C-contiguous array; this is the only copy (the dtype cast).
+    close_prices = np.ascontiguousarray(df["Close"].to_numpy(copy=False), dtype=np.float32)
+    (ema9, ema21, rsi, bb_high, bb_low,
+     sma50_prev, sma50, sma200_prev, sma200) = compute_indicators(close_prices)
 
     try:
-        price = df["Close"].iloc[-1].item()
-        rsi = df["RSI"].iloc[-1].item()
-        ema9 = df["EMA9"].iloc[-1].item()
-        ema21 = df["EMA21"].iloc[-1].item()
-        bb_high = bb.bollinger_hband().iloc[-1].item()
-        bb_low = bb.bollinger_lband().iloc[-1].item()
-        sma50 = df["SMA50"].iloc[-1].item()
-        sma200 = df["SMA200"].iloc[-1].item()
+        # Only the latest bar is needed: read it once from the arrays instead of
+        # writing indicator columns into df and selecting each of them back
+        price = df["Close"].to_numpy(copy=False)[-1].item()
+        ema9, ema21, rsi = ema9[-1].item(), ema21[-1].item(), rsi[-1].item()
     except (IndexError, AttributeError):
         return None, "❌ Error: Not enough data points to calculate indicators."
 
     # ----- Trade decision (More selective "Pro" signals) -----
-    signal = "🤝 HOLD / WAIT (no confluence yet)"
+    feats = np.array([ema9, ema21, rsi, price, bb_low, bb_high, sma50, sma200, sma50_prev, sma200_prev])
+    signal_id, cross_id = (int(i) for i in classify_setup(feats))
+    signal = _SIGNALS[signal_id]
     entry = price
     stop_loss = None
     take_profit = None
     confluence = []
 
     # Check for Golden/Death Cross
-    # Added .item() to ensure scalar values for comparison
-    sma50_prev = df['SMA50'].iloc[-2].item()
-    sma200_prev = df['SMA200'].iloc[-2].item()
-    if sma50 > sma200 and sma50_prev < sma200_prev:
-        confluence.append("Golden Cross (Bullish)")
-    elif sma50 < sma200 and sma50_prev > sma200_prev:
-        confluence.append("Death Cross (Bearish)")
+    if cross_id:
+        confluence.append(_CROSSES[cross_id])
 
     # Check for Fibonacci Retracement
     fib_levels = get_fib_levels(df)
-    if fib_levels:
-        for level_name, level_price in fib_levels.items():
-            # Check if current price is within a small percentage of a Fibonacci level
-            if abs(price - level_price) / price < 0.005: # 0.5% tolerance
-                confluence.append(f"Price at {level_name} Fib Level")
-
-    # Pro-Buy Signal: Strong Uptrend (EMA9 > EMA21), Oversold RSI, and price near Lower Bollinger Band
-    if ema9 > ema21 and rsi < 35 and price <= bb_low:
-        signal = "✅ PRO-BUY Setup"
-        stop_loss = price * 0.98  # 2% below
-        take_profit = price * 1.04  # 4% above
-        confluence.extend(["RSI oversold", "Price at Lower BB", "EMA9 > EMA21"])
-
-    # Pro-Sell Signal: Strong Downtrend (EMA9 < EMA21), Overbought RSI, and price near Upper Bollinger Band
-    elif ema9 < ema21 and rsi > 65 and price >= bb_high:
-        signal = "❌ PRO-SELL Setup"
-        stop_loss = price * 1.02  # 2% above
-        take_profit = price * 0.96  # 4% below
-        confluence.extend(["RSI overbought", "Price at Upper BB", "EMA9 < EMA21"])
+    if fib_levels is not None:
+        # Check if current price is within a small percentage of each Fibonacci level
+        near_level = np.abs(price - fib_levels) / price < 0.005 # 0.5% tolerance
+        confluence.extend(
+            f"Price at {level_name} Fib Level"
+            for level_name, is_near in zip(_FIB_NAMES, near_level) if is_near
+        )
+
+    if signal_id:
+        stop_loss = price * _STOP_LOSS_MULT[signal_id].item()
+        take_profit = price * _TAKE_PROFIT_MULT[signal_id].item()
+        confluence.extend(_SIGNAL_CONFLUENCE[signal_id])
+
+    if skip_unchanged:
+        # Recorded only once the analysis is done, so a failed run is retried next tick
+        _LAST_BAR[(symbol, timeframe)] = last_bar
 
     # Only return a message if a strong signal is found
     if not confluence:
@@ -202,49 +346,104 @@ Confluence: {", ".join(confluence) if confluence else "No strong confluence"}
     return price, msg
 
 # ---------------- BOT EVENTS ----------------
+@bot.event
+async def setup_hook():
+    # Runs once before connecting, unlike on_ready which fires again on reconnects
+    try:
+        # Keep a reference to the runner so the server lives as long as the bot
+        bot.keep_alive_runner = await keep_alive()
+    except OSError as e:
+        # The ping endpoint is optional, never let it stop the bot from starting
+        logging.warning(f"⚠️ Keep-alive server not started on port 8080: {e}")
+        return
+    logging.info("✅ Keep-alive server listening on port 8080")
+
 @bot.event
 async def on_ready():
     logging.info(f"✅ Logged in as {bot.user}")
     stock_alert.start()
 
 # ---------------- TASK LOOP ----------------
+async def build_symbol_alert(symbol: str, config: dict, bars=None):
+    """
+    Analyze one symbol off the event loop.
+    Returns (symbol, channel, embed) for an alert to post, or None.
+    """
+    channel_id = config["channel_id"]
+    timeframe = config["timeframe"]
+        
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        logging.warning(f"Channel {channel_id} not found for {symbol}")
+        return None
+
+    try:
+        # yfinance and the indicator math are blocking, run them in a worker thread.
+        # Ticks where the latest bar hasn't moved since the last run are skipped.
+        price, msg = await asyncio.to_thread(
+            analyze_stock, symbol, timeframe=timeframe, skip_unchanged=True, bars=bars
+        )
+    except Exception as e:
+        logging.exception(f"Error in stock_alert for {symbol}: {e}")
+        return None
+
+    if msg is None:
+        logging.info(f"No strong signal for {symbol}. Skipping alert.")
+        return None
+    embed = discord.Embed(
+        title=f"📈 {symbol} Trading Alert",
+        description=msg,
+        color=discord.Color.blue()
+    )
+    return symbol, channel, embed
+
+async def build_timeframe_alerts(timeframe: str, symbols: list[str]):
+    """Download bars for all symbols sharing a timeframe in one batch, then analyze each."""
+    try:
+        bars = await asyncio.to_thread(fetch_bars_batch, symbols, timeframe)
+    except Exception as e:
+        # Each symbol falls back to its own download in analyze_stock
+        logging.exception(f"Error in batch download for {timeframe}: {e}")
+        bars = {}
+    return await asyncio.gather(
+        *(build_symbol_alert(symbol, STOCK_CHANNELS[symbol], bars.get(symbol)) for symbol in symbols)
+    )
+
 @tasks.loop(minutes=5)
 async def stock_alert():
     """Send pro-trader alerts every 5 minutes."""
+    groups = defaultdict(list)
     for symbol, config in STOCK_CHANNELS.items():
-        channel_id = config["channel_id"]
-        timeframe = config["timeframe"]
-        
         if not is_market_open(symbol):
             logging.info(f"Market for {symbol} is closed. Skipping alert.")
             continue
-            
-        channel = bot.get_channel(channel_id)
-        if channel is None:
-            logging.warning(f"Channel {channel_id} not found for {symbol}")
-            continue
+        groups[config["timeframe"]].append(symbol)
+
+    # One download per timeframe; the downloads take turns, the analysis runs concurrently
+    results = await asyncio.gather(
+        *(build_timeframe_alerts(timeframe, symbols) for timeframe, symbols in groups.items())
+    )
+    alerts = [alert for group in results for alert in group if alert is not None]
 
-        try:
-            price, msg = analyze_stock(symbol, timeframe=timeframe)
-            if msg is not None:
-                embed = discord.Embed(
-                    title=f"📈 {symbol} Trading Alert",
-                    description=msg,
-                    color=discord.Color.blue()
-                )
-                await channel.send(embed=embed)
-                logging.info(f"Sent trade plan for {symbol}")
-            else:
-                logging.info(f"No strong signal for {symbol}. Skipping alert.")
-        except Exception as e:
-            logging.exception(f"Error in stock_alert for {symbol}: {e}")
+    # Post every alert at once; discord.py's rate limiter paces the requests
+    sent = await asyncio.gather(
+        *(channel.send(embed=embed) for _, channel, embed in alerts),
+        return_exceptions=True
+    )
+    for (symbol, _, _), result in zip(alerts, sent):
+        if isinstance(result, Exception):
+            logging.error(f"Error sending alert for {symbol}: {result}", exc_info=result)
+            # Forget the bar so the next tick analyzes and posts it again
+            _LAST_BAR.pop((symbol, STOCK_CHANNELS[symbol]["timeframe"]), None)
+        else:
+            logging.info(f"Sent trade plan for {symbol}")
 
 # ---------------- MANUAL COMMAND ----------------
 @bot.command()
 async def plan(ctx, symbol: str, timeframe: str = "1d"):
     """Get live trade plan for a stock/crypto manually."""
     try:
-        price, msg = analyze_stock(symbol, timeframe=timeframe)
+        price, msg = await asyncio.to_thread(analyze_stock, symbol, timeframe=timeframe)
         if msg is not None:
             embed = discord.Embed(
                 title=f"📊 {symbol} Trade Plan ({timeframe})",
@@ -1,20 +1,16 @@
 # This script sets up a simple web server that UptimeRobot can ping to keep the bot alive.
-from flask import Flask
-from threading import Thread
-
-# Create a Flask web server instance
-app = Flask('')
+# It runs on the bot's own asyncio loop using aiohttp (already installed with discord.py).
+from aiohttp import web
 
 # Define a route for the web server's root URL
-@app.route('/')
-def home():
-    return "Hello! I'm alive."
-
-# This function will run the web server in a separate thread
-def run():
-    app.run(host='0.0.0.0', port=8080)
+async def home(request):
+    return web.Response(text="Hello! I'm alive.")
 
-# This function starts the thread for the web server
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
+# This function starts the web server on the running event loop
+async def keep_alive(host='0.0.0.0', port=8080):
+    app = web.Application()
+    app.router.add_get('/', home)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner